@@ -0,0 +1,146 @@
+"""
+Headless batch runner for the FlexWork unit economics analysis.
+
+Runs the load, validate, root-cause and action-plan stages from src/pipeline.py
+without Jupyter, caching each stage's output so repeated runs only recompute
+what changed.
+
+Usage:
+    python run_pipeline.py
+    python run_pipeline.py --set simulate.pricing_recovery_rate=[0.25,0.32,0.40]
+    python run_pipeline.py --stage root_cause --output outputs/root_cause.json
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from pipeline import (  # noqa: E402
+    DEFAULT_CACHE_DIR, DEFAULT_TARGETS, STAGES, PipelineError, merge_params, run_pipeline,
+)
+from db import DEFAULT_DB_PATH  # noqa: E402
+
+
+def parse_overrides(assignments):
+    """Parse `stage.param=value` strings into per-stage overrides (values as JSON when possible)."""
+    overrides = {}
+    for assignment in assignments:
+        name, sep, raw_value = assignment.partition('=')
+        stage, dot, param = name.partition('.')
+        if not sep or not dot:
+            raise argparse.ArgumentTypeError(f"Expected STAGE.PARAM=VALUE, got: {assignment}")
+        try:
+            value = json.loads(raw_value)
+        except json.JSONDecodeError:
+            value = raw_value
+        overrides.setdefault(stage, {})[param] = value
+    return overrides
+
+
+def positive_int(text):
+    """argparse type for counts that must be at least 1."""
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected an integer, got {text!r}")
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return value
+
+
+def _to_json(value):
+    """Make NumPy values JSON serializable."""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def print_summary(results):
+    """Print the validation and action plan results in the notebooks' format."""
+    if 'validate' in results:
+        validation = results['validate']
+        print("\nMETRIC VALIDATION")
+        print("-" * 80)
+        for metric in ('gmv', 'contra_revenue', 'net_revenue'):
+            summary = validation[metric]
+            print(f"  • {metric}: {summary['rows_discrepant']:,} rows discrepant "
+                  f"({summary['pct_rows_discrepant']:.2f}%), max abs diff ${summary['max_abs_diff']:.2f}")
+
+    if 'action_plan' in results:
+        plan = results['action_plan']
+        print("\nACTION PLAN")
+        print("-" * 80)
+        print(f"  • {plan['baseline_period']}: ${plan['baseline_net_rev_per_shift']:.2f}/project")
+        print(f"  • {plan['actual_period']}: ${plan['actual_net_rev_per_shift']:.2f}/project "
+              f"({plan['total_degradation']:+.2f})")
+        print("  • Top drivers:")
+        for driver in plan['top_drivers']:
+            print(f"      {driver['driver']}: ${driver['impact_per_shift']:+.2f}/project")
+        projection = plan['projection']
+        print(f"  • Projection P10/P50/P90: ${projection['p10']:.2f} / "
+              f"${projection['p50']:.2f} / ${projection['p90']:.2f} per project")
+        for label, pct in plan['probability_pct'].items():
+            print(f"  • P(net rev/project >= {label}): {pct:.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--db', default=DEFAULT_DB_PATH,
+                        help=f"SQLite database with the projects table (default: {DEFAULT_DB_PATH})")
+    parser.add_argument('--stage', action='append', choices=list(STAGES), dest='stages',
+                        help="Stage to produce; repeatable (default: validate and action_plan)")
+    parser.add_argument('--set', action='append', default=[], dest='assignments',
+                        metavar='STAGE.PARAM=VALUE', help="Override a stage parameter; repeatable")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f"Directory for cached stage outputs (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Recompute every stage, ignoring cached outputs")
+    parser.add_argument('--jobs', type=positive_int, default=None,
+                        help="Maximum number of stages scheduled at once (threads; no CPU speedup)")
+    parser.add_argument('--output', help="Write the requested stage outputs to this JSON file")
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(args.db):
+        parser.error(f"--db: database not found: {args.db}")
+
+    try:
+        overrides = parse_overrides(args.assignments)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    overrides.setdefault('load', {})['db_path'] = args.db
+    try:
+        merge_params(overrides)
+    except PipelineError as e:
+        parser.error(f"--set: {e}")
+
+    targets = args.stages or list(DEFAULT_TARGETS)
+
+    print("=" * 80)
+    print(f"FlexWork pipeline: {', '.join(targets)}")
+    print("=" * 80)
+
+    try:
+        results = run_pipeline(
+            targets=targets,
+            overrides=overrides,
+            cache_dir=args.cache_dir,
+            use_cache=not args.no_cache,
+            jobs=args.jobs,
+        )
+    except PipelineError as e:
+        sys.exit(f"error: {e}")
+
+    print_summary(results)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, default=_to_json)
+        print(f"\n✓ Saved results to: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+SQLite loader for the FlexWork projects table.
+
+`load_columns` returns a dict of NumPy arrays that plugs straight into the
+formulas in `metrics.py` without importing pandas. The notebooks keep using
+`pd.read_sql` directly.
+"""
+
+import sqlite3
+
+import numpy as np
+
+DEFAULT_DB_PATH = 'data/processed/flexwork.db'
+PROJECTS_QUERY = "SELECT * FROM projects"
+
+
+def _to_array(column):
+    """
+    Convert an object column of SQLite values to a typed NumPy array.
+
+    A column whose non-NULL values are all SQLite INTEGER/REAL becomes a numeric
+    array (float with NULL -> NaN when NULLs are present; an all-NULL column is
+    all NaN). Anything else,
+    including text, stays an object array: text is never parsed, so codes like
+    '01234' keep their leading zeros and NULL stays None.
+    """
+    values = column.tolist()
+    types = set(map(type, values))
+    has_null = type(None) in types
+    types.discard(type(None))
+
+    if not types:
+        return np.full(len(values), np.nan)
+    if not types <= {int, float}:
+        return column.copy()
+    if types == {int} and not has_null:
+        return np.array(values, dtype=np.int64)
+    return np.array(values, dtype=float)
+
+
+def load_columns(db_path=DEFAULT_DB_PATH, query=PROJECTS_QUERY, params=()):
+    """
+    Load query results as a dict of NumPy arrays keyed by column name.
+
+    Args:
+        db_path: Path to the SQLite database
+        query: SQL query to run
+        params: Query parameters
+
+    Returns:
+        dict: column name -> NumPy array
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.execute(query, params)
+        columns = [description[0] for description in cursor.description]
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    if not rows:
+        return {column: np.array([]) for column in columns}
+
+    # One C-level transpose into a 2D object array; much cheaper than zip(*rows)
+    table = np.array(rows, dtype=object)
+    return {column: _to_array(table[:, i]) for i, column in enumerate(columns)}
+
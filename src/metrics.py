@@ -2,9 +2,16 @@
 Metric calculation functions for FlexWork unit economics analysis.
 
 All formulas follow definitions from the assessment PDF Appendix C.
+
+The formulas only index columns by name and use NumPy arithmetic, so they
+accept a pandas Series/DataFrame as well as a plain dict of NumPy arrays.
+pandas is never imported here; `db.load_columns` provides the pandas-free
+path used by run_pipeline.py.
 """
 
-import pandas as pd
+import numpy as np
+
+SHIFT_TRANSACTION_TYPES = ('Normal', 'Dispute')
 
 
 def gmv(row):
@@ -15,10 +22,10 @@ def gmv(row):
           - Vendor Allowances - Credit Memos (excl Enterprise Corp A/Enterprise Corp C)
 
     Args:
-        row: pandas Series with required fields
+        row: pandas Series/DataFrame or dict of NumPy arrays with required fields
 
     Returns:
-        float: GMV value
+        float or array: GMV value(s)
     """
     return (
         row['client_total'] +
@@ -36,10 +43,10 @@ def contra_revenue(row):
     Contra Revenue = Contractor Total - Contractor TNS/Coach + Contractor W2 Taxes
 
     Args:
-        row: pandas Series with required fields
+        row: pandas Series/DataFrame or dict of NumPy arrays with required fields
 
     Returns:
-        float: Contra revenue value
+        float or array: Contra revenue value(s)
     """
     return (
         row['contractor_total'] -
@@ -55,10 +62,10 @@ def net_revenue(row):
     Net Revenue = GMV + Instant Pay Fees - Contra Revenue
 
     Args:
-        row: pandas Series with required fields
+        row: pandas Series/DataFrame or dict of NumPy arrays with required fields
 
     Returns:
-        float: Net revenue value
+        float or array: Net revenue value(s)
     """
     return gmv(row) + row['total_instant_pay_fees'] - contra_revenue(row)
 
@@ -67,36 +74,48 @@ def calculate_metrics(df):
     """
     Add GMV, Contra Revenue, and Net Revenue columns to dataframe.
 
+    Metrics are computed column-wise rather than with a per-row apply.
+
     Args:
-        df: pandas DataFrame with raw transaction data
+        df: pandas DataFrame or dict of NumPy arrays with raw transaction data
 
     Returns:
-        pandas DataFrame with added metric columns
+        Copy of the input with added metric columns
     """
     df = df.copy()
-    df['gmv_calc'] = df.apply(gmv, axis=1)
-    df['contra_revenue_calc'] = df.apply(contra_revenue, axis=1)
-    df['net_revenue_calc'] = df.apply(net_revenue, axis=1)
+    df['gmv_calc'] = gmv(df)
+    df['contra_revenue_calc'] = contra_revenue(df)
+    df['net_revenue_calc'] = net_revenue(df)
     return df
 
 
+def _per_shift(df, column):
+    """
+    Aggregate `column` per project, returning 0 when there are no projects.
+
+    NULL (NaN) values are skipped, matching pandas `.sum()` and SQL `SUM`.
+    """
+    total = np.nansum(df[column])
+    total_shifts = np.nansum(df['project_counts_payment'])
+
+    if total_shifts == 0:
+        return 0
+
+    return total / total_shifts
+
+
 def net_rev_per_shift(df):
     """
     Calculate aggregate Net Revenue per Project for a dataframe.
 
     Args:
-        df: pandas DataFrame with net_revenue and project_counts_payment columns
+        df: pandas DataFrame or dict of NumPy arrays with net_revenue and
+            project_counts_payment columns
 
     Returns:
         float: Net revenue per project
     """
-    total_revenue = df['net_revenue'].sum()
-    total_shifts = df['project_counts_payment'].sum()
-
-    if total_shifts == 0:
-        return 0
-
-    return total_revenue / total_shifts
+    return _per_shift(df, 'net_revenue')
 
 
 def gmv_per_shift(df):
@@ -104,18 +123,13 @@ def gmv_per_shift(df):
     Calculate aggregate GMV per Project for a dataframe.
 
     Args:
-        df: pandas DataFrame with gmv and project_counts_payment columns
+        df: pandas DataFrame or dict of NumPy arrays with gmv and
+            project_counts_payment columns
 
     Returns:
         float: GMV per project
     """
-    total_gmv = df['gmv'].sum()
-    total_shifts = df['project_counts_payment'].sum()
-
-    if total_shifts == 0:
-        return 0
-
-    return total_gmv / total_shifts
+    return _per_shift(df, 'gmv')
 
 
 def contra_per_shift(df):
@@ -123,18 +137,13 @@ def contra_per_shift(df):
     Calculate aggregate Contra Revenue per Project for a dataframe.
 
     Args:
-        df: pandas DataFrame with contra_revenue and project_counts_payment columns
+        df: pandas DataFrame or dict of NumPy arrays with contra_revenue and
+            project_counts_payment columns
 
     Returns:
         float: Contra revenue per project
     """
-    total_contra = df['contra_revenue'].sum()
-    total_shifts = df['project_counts_payment'].sum()
-
-    if total_shifts == 0:
-        return 0
-
-    return total_contra / total_shifts
+    return _per_shift(df, 'contra_revenue')
 
 
 def instant_pay_per_shift(df):
@@ -142,18 +151,13 @@ def instant_pay_per_shift(df):
     Calculate aggregate Instant Pay Fees per Project for a dataframe.
 
     Args:
-        df: pandas DataFrame with total_instant_pay_fees and project_counts_payment columns
+        df: pandas DataFrame or dict of NumPy arrays with total_instant_pay_fees
+            and project_counts_payment columns
 
     Returns:
         float: Instant pay fees per project
     """
-    total_instant_pay = df['total_instant_pay_fees'].sum()
-    total_shifts = df['project_counts_payment'].sum()
-
-    if total_shifts == 0:
-        return 0
-
-    return total_instant_pay / total_shifts
+    return _per_shift(df, 'total_instant_pay_fees')
 
 
 def filter_shift_transactions(df):
@@ -170,9 +174,52 @@ def filter_shift_transactions(df):
     actual project profitability.
 
     Args:
-        df: pandas DataFrame with transaction_type column
+        df: pandas DataFrame or dict of NumPy arrays with transaction_type column
+
+    Returns:
+        Same type as the input, filtered to Normal and Dispute transactions
+    """
+    transaction_type = df['transaction_type']
+    if hasattr(transaction_type, 'isin'):
+        mask = transaction_type.isin(SHIFT_TRANSACTION_TYPES)
+    else:
+        mask = np.isin(np.asarray(transaction_type), SHIFT_TRANSACTION_TYPES)
+    return select_rows(df, mask)
+
+
+def select_rows(df, mask):
+    """
+    Select rows matching a boolean mask.
+
+    Args:
+        df: pandas DataFrame or dict of NumPy arrays
+        mask: boolean array with one entry per row
 
     Returns:
-        pandas DataFrame filtered to Normal and Dispute transactions
+        Same type as the input, containing only the selected rows
+    """
+    if isinstance(df, dict):
+        return {column: np.asarray(values)[mask] for column, values in df.items()}
+    return df[mask].copy()
+
+
+def sum_by(keys, *columns):
     """
-    return df[df['transaction_type'].isin(['Normal', 'Dispute'])].copy()
+    Sum one or more columns per distinct key (a NumPy group-by).
+
+    NULL (NaN) values are skipped, matching SQL `SUM ... GROUP BY`.
+
+    Args:
+        keys: array of group labels, one per row
+        *columns: numeric arrays aligned with keys
+
+    Returns:
+        tuple: (sorted distinct keys, list of per-key sums for each column)
+    """
+    groups, inverse = np.unique(np.asarray(keys), return_inverse=True)
+    sums = [
+        np.bincount(inverse, weights=np.nan_to_num(np.asarray(column, dtype=float), nan=0.0),
+                    minlength=len(groups))
+        for column in columns
+    ]
+    return groups, sums
@@ -0,0 +1,601 @@
+"""
+Headless analysis pipeline for FlexWork unit economics.
+
+Reproduces the load -> validate -> root cause -> action plan flow of the
+notebooks as a DAG of stages built on `metrics.py`. Each stage's output is
+cached under a key hashed from the pipeline source (metrics.py, db.py and
+this module), its parameters, the content of any input files and the keys of
+its upstream stages, so changing a Monte Carlo
+lever only re-runs `simulate` and the stages that consume it. Stages whose
+inputs are ready (e.g. the segment, tenure and vertical breakdowns) are
+scheduled together on a thread pool; their NumPy and object-array work holds
+the GIL, so this overlaps stages rather than speeding up CPU-bound work.
+"""
+
+import copy
+import glob
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+
+from db import DEFAULT_DB_PATH, load_columns
+from metrics import (
+    SHIFT_TRANSACTION_TYPES,
+    contra_per_shift,
+    contra_revenue,
+    gmv,
+    gmv_per_shift,
+    instant_pay_per_shift,
+    net_rev_per_shift,
+    net_revenue,
+    select_rows,
+    sum_by,
+)
+
+DEFAULT_CACHE_DIR = 'data/cache'
+DEFAULT_TARGETS = ('validate', 'action_plan')
+
+
+def _not_null(values):
+    """Boolean mask of non-NULL entries (None for text columns, NaN for numbers)."""
+    values = np.asarray(values)
+    if values.dtype.kind == 'f':
+        return ~np.isnan(values)
+    if values.dtype == object:
+        return np.array([value is not None for value in values], dtype=bool)
+    return np.ones(len(values), dtype=bool)
+
+
+def _periods(rows):
+    """Sorted comparison periods present in the filtered rows."""
+    return sorted(np.unique(rows['period']).tolist())
+
+
+def _safe_ratio(numerator, denominator):
+    return float(numerator / denominator) if denominator else 0.0
+
+
+class PipelineError(ValueError):
+    """Raised when the pipeline configuration or data cannot produce a result."""
+
+
+def _require_finite(values, stage):
+    """Raise PipelineError if any value in a (nested) dict is NaN or infinite."""
+    def walk(value, path):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                yield from walk(item, f"{path}.{key}" if path else str(key))
+        elif isinstance(value, float) and not np.isfinite(value):
+            yield path
+
+    bad = list(walk(values, ''))
+    if bad:
+        raise PipelineError(f"{stage}: non-finite values in {', '.join(bad)}")
+
+
+# ---------------------------------------------------------------------------
+# Stages
+# ---------------------------------------------------------------------------
+
+def _load(params):
+    """Read the projects table into NumPy columns."""
+    return load_columns(params['db_path'])
+
+
+def _validate(params, data):
+    """Compare stored GMV / Contra / Net Revenue with the metrics.py formulas."""
+    n_rows = len(data['gmv'])
+    calculated = {
+        'gmv': gmv(data),
+        'contra_revenue': contra_revenue(data),
+        'net_revenue': net_revenue(data),
+    }
+
+    summary = {'rows': n_rows}
+    for metric, values in calculated.items():
+        diff = np.abs(data[metric] - values)
+        discrepant = int(np.sum(diff > params['tolerance']))
+        summary[metric] = {
+            'max_abs_diff': float(np.nanmax(diff)) if n_rows else 0.0,
+            'mean_abs_diff': float(np.nanmean(diff)) if n_rows else 0.0,
+            'rows_discrepant': discrepant,
+            'pct_rows_discrepant': _safe_ratio(discrepant * 100, n_rows),
+        }
+    return summary
+
+
+def _q3(params, data):
+    """Filter to shift transactions in the comparison months and tag each row's period."""
+    month = np.asarray(data['month_pst']).astype(str)
+    months = [f"{year}-{m:02d}" for year in params['years'] for m in params['months']]
+
+    mask = (
+        np.isin(month.astype('U7'), months) &
+        np.isin(np.asarray(data['transaction_type']), SHIFT_TRANSACTION_TYPES) &
+        _not_null(data['business_segment'])
+    )
+
+    rows = select_rows(data, mask)
+    rows['period'] = np.char.add('Q3_', month[mask].astype('U4'))
+
+    missing = [str(year) for year in params['years'] if f"Q3_{year}" not in set(rows['period'].tolist())]
+    if missing:
+        raise PipelineError(
+            f"q3: no shift transactions for year(s) {', '.join(missing)} "
+            f"in months {params['months']}"
+        )
+    return rows
+
+
+def _overall(params, rows):
+    """Per-project KPIs for each period."""
+    result = {}
+    for period in _periods(rows):
+        period_rows = select_rows(rows, rows['period'] == period)
+        result[period] = {
+            'transaction_count': len(period_rows['period']),
+            'total_shifts': float(np.nansum(period_rows['project_counts_payment'])),
+            'gmv_per_shift': float(gmv_per_shift(period_rows)),
+            'contra_per_shift': float(contra_per_shift(period_rows)),
+            'instant_pay_per_shift': float(instant_pay_per_shift(period_rows)),
+            'net_rev_per_shift': float(net_rev_per_shift(period_rows)),
+        }
+    return result
+
+
+def _operations(params, rows):
+    """Zero GMV and overbooking rates for Normal transactions."""
+    normal = select_rows(rows, np.asarray(rows['transaction_type']) == 'Normal')
+
+    result = {}
+    for period in _periods(normal):
+        period_rows = select_rows(normal, normal['period'] == period)
+        flag = np.asarray(period_rows['overbook_project_group_flag'])
+        overbooked = flag == 1
+        result[period] = {
+            'transactions': len(overbooked),
+            'zero_gmv_rate': float(np.mean(np.asarray(period_rows['gmv']) == 0)),
+            'overbook_rate': float(np.mean(overbooked)),
+            'overbook_net_rev_per_shift': float(net_rev_per_shift(select_rows(period_rows, overbooked))),
+            'normal_net_rev_per_shift': float(net_rev_per_shift(select_rows(period_rows, flag == 0))),
+        }
+    return result
+
+
+def _breakdown(params, rows):
+    """Project mix and net revenue per project by one dimension, per period."""
+    result = {}
+    for period in _periods(rows):
+        period_rows = select_rows(rows, rows['period'] == period)
+        keys = np.asarray(period_rows[params['column']])
+        shifts = np.asarray(period_rows['project_counts_payment'], dtype=float)
+        total_shifts = np.nansum(shifts)
+
+        keep = _not_null(keys)
+        keep &= ~np.isin(keys.astype(str), params.get('exclude', []))
+        groups, (group_shifts, group_net) = sum_by(
+            keys[keep].astype(str), shifts[keep], period_rows['net_revenue'][keep]
+        )
+
+        for group, n_shifts, net in zip(groups.tolist(), group_shifts, group_net):
+            result.setdefault(group, {})[period] = {
+                'shifts': float(n_shifts),
+                'mix': _safe_ratio(n_shifts, total_shifts),
+                'net_rev_per_shift': _safe_ratio(net, n_shifts),
+            }
+    return result
+
+
+def _mix_effect(breakdown, base, actual):
+    """Sum over groups of (actual mix - base mix) x base net revenue per project."""
+    empty = {'mix': 0.0, 'net_rev_per_shift': 0.0}
+    return sum(
+        (periods.get(actual, empty)['mix'] - periods.get(base, empty)['mix']) *
+        periods.get(base, empty)['net_rev_per_shift']
+        for periods in breakdown.values()
+    )
+
+
+def _rate_effect(breakdown, base, actual):
+    """Sum over groups of actual mix x change in net revenue per project."""
+    return sum(
+        periods[actual]['mix'] *
+        (periods[actual]['net_rev_per_shift'] - periods[base]['net_rev_per_shift'])
+        for periods in breakdown.values()
+        if base in periods and actual in periods
+    )
+
+
+def _root_cause(params, overall, operations, segment, tenure, vertical):
+    """
+    Quantify each driver's contribution to the change in net revenue per project.
+
+    Mirrors drivers 1-7 of notebook 03, section 11.
+    """
+    periods = sorted(overall)
+    if len(periods) < 2:
+        raise PipelineError(
+            f"root_cause: needs a baseline and an actual period, found {periods or 'none'} "
+            f"(check q3.years)"
+        )
+    base, actual = periods[0], periods[-1]
+    missing = [period for period in (base, actual) if period not in operations]
+    if missing:
+        raise PipelineError(f"root_cause: no Normal transactions in {', '.join(missing)}")
+    ops_base, ops_actual = operations[base], operations[actual]
+
+    overbook_penalty = (
+        ops_actual['overbook_net_rev_per_shift'] - ops_actual['normal_net_rev_per_shift']
+    )
+    drivers = {
+        'zero_gmv_rate': (
+            (ops_actual['zero_gmv_rate'] - ops_base['zero_gmv_rate']) * params['zero_gmv_penalty']
+        ),
+        'overbook_rate': (ops_actual['overbook_rate'] - ops_base['overbook_rate']) * overbook_penalty,
+        'vertical_mix': _mix_effect(vertical, base, actual),
+        'tenure_mix': _mix_effect(tenure, base, actual),
+        'segment_rate': _rate_effect(segment, base, actual),
+        'contra_cost': -(overall[actual]['contra_per_shift'] - overall[base]['contra_per_shift']),
+        'instant_pay_fees': (
+            overall[actual]['instant_pay_per_shift'] - overall[base]['instant_pay_per_shift']
+        ),
+    }
+
+    result = {
+        'baseline_period': base,
+        'actual_period': actual,
+        'baseline_net_rev_per_shift': overall[base]['net_rev_per_shift'],
+        'actual_net_rev_per_shift': overall[actual]['net_rev_per_shift'],
+        'total_degradation': (
+            overall[actual]['net_rev_per_shift'] - overall[base]['net_rev_per_shift']
+        ),
+        'drivers': {name: float(impact) for name, impact in drivers.items()},
+    }
+    _require_finite(result, 'root_cause')
+    return result
+
+
+def _simulate(params, root_cause):
+    """Monte Carlo projection of the 90-day plan (see notebook 04, section 8.2)."""
+    rng = np.random.RandomState(params['seed'])
+    n = params['n_simulations']
+
+    levers = {
+        'operational': (
+            rng.triangular(*params['problem_rate_reduction'], n) *
+            rng.triangular(*params['net_recovery_per_shift'], n)
+        ),
+        'pricing': rng.triangular(*params['pricing_recovery_rate'], n) * params['gmv_decline_opportunity'],
+        'mix': rng.triangular(*params['mix_success_rate'], n) * params['mix_base_impact'],
+        'f90': rng.triangular(*params['f90_success_rate'], n) * params['f90_base_impact'],
+    }
+    mfg_success_prob = rng.uniform(*params['mfg_success_prob'], n)
+    levers['mfg'] = (rng.random_sample(n) < mfg_success_prob).astype(int) * params['mfg_base_impact']
+
+    baseline = root_cause['actual_net_rev_per_shift']
+    outcomes = baseline + sum(levers.values())
+
+    return {
+        'baseline': baseline,
+        'n_simulations': n,
+        'p10': float(np.percentile(outcomes, 10)),
+        'p50': float(np.percentile(outcomes, 50)),
+        'p90': float(np.percentile(outcomes, 90)),
+        'mean': float(np.mean(outcomes)),
+        'lever_medians': {name: float(np.median(impact)) for name, impact in levers.items()},
+        'outcomes': outcomes,
+    }
+
+
+def _action_plan(params, root_cause, simulation):
+    """Rank the drivers and summarise the projected recovery."""
+    outcomes = simulation['outcomes']
+    if not np.all(np.isfinite(outcomes)):
+        raise PipelineError("action_plan: simulated outcomes contain non-finite values")
+    targets = {f"{target:.2f}": target for target in params['targets']}
+    targets[root_cause['baseline_period']] = root_cause['baseline_net_rev_per_shift']
+
+    drivers = sorted(root_cause['drivers'].items(), key=lambda item: item[1])
+
+    result = {
+        'baseline_period': root_cause['baseline_period'],
+        'actual_period': root_cause['actual_period'],
+        'baseline_net_rev_per_shift': root_cause['baseline_net_rev_per_shift'],
+        'actual_net_rev_per_shift': root_cause['actual_net_rev_per_shift'],
+        'total_degradation': root_cause['total_degradation'],
+        'top_drivers': [
+            {'driver': name, 'impact_per_shift': impact}
+            for name, impact in drivers[:params['top_n']]
+        ],
+        'projection': {
+            key: simulation[key] for key in ('p10', 'p50', 'p90', 'mean')
+        },
+        'lever_medians': simulation['lever_medians'],
+        'probability_pct': {
+            label: float(np.mean(outcomes >= target) * 100)
+            for label, target in targets.items()
+        },
+    }
+    _require_finite(result, 'action_plan')
+    return result
+
+
+# persist=False stages are recomputed on demand rather than cached: the raw
+# load is cheaper to re-read from SQLite than to unpickle, and q3 is cached.
+Stage = namedtuple('Stage', ['func', 'deps', 'file_params', 'persist'], defaults=((), True))
+
+STAGES = {
+    'load': Stage(_load, (), ('db_path',), persist=False),
+    'validate': Stage(_validate, ('load',)),
+    'q3': Stage(_q3, ('load',)),
+    'overall': Stage(_overall, ('q3',)),
+    'operations': Stage(_operations, ('q3',)),
+    'segment': Stage(_breakdown, ('q3',)),
+    'tenure': Stage(_breakdown, ('q3',)),
+    'vertical': Stage(_breakdown, ('q3',)),
+    'root_cause': Stage(_root_cause, ('overall', 'operations', 'segment', 'tenure', 'vertical')),
+    'simulate': Stage(_simulate, ('root_cause',)),
+    'action_plan': Stage(_action_plan, ('root_cause', 'simulate')),
+}
+
+DEFAULT_PARAMS = {
+    'load': {'db_path': DEFAULT_DB_PATH},
+    'validate': {'tolerance': 0.01},
+    'q3': {'years': [2024, 2025], 'months': [7, 8]},
+    'overall': {},
+    'operations': {},
+    'segment': {'column': 'business_segment'},
+    'tenure': {'column': 'new_existing_client', 'exclude': ['Unknown']},
+    'vertical': {'column': 'vertical'},
+    'root_cause': {'zero_gmv_penalty': -82.0},
+    'simulate': {
+        'seed': 42,
+        'n_simulations': 10000,
+        'problem_rate_reduction': [0.04, 0.055, 0.07],
+        'net_recovery_per_shift': [15.0, 22.0, 30.0],
+        'pricing_recovery_rate': [0.20, 0.30, 0.40],
+        'gmv_decline_opportunity': 14.64,
+        'mix_success_rate': [0.15, 0.25, 0.40],
+        'mix_base_impact': 0.39,
+        'f90_success_rate': [0.25, 0.35, 0.50],
+        'f90_base_impact': 0.20,
+        'mfg_success_prob': [0.40, 0.60],
+        'mfg_base_impact': 0.27,
+    },
+    'action_plan': {'targets': [35.0, 38.0], 'top_n': 3},
+}
+
+
+# ---------------------------------------------------------------------------
+# Caching and execution
+# ---------------------------------------------------------------------------
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def code_digest():
+    """SHA-256 of the source files stage outputs depend on (metrics.py, db.py, pipeline.py)."""
+    digest = hashlib.sha256()
+    for path in (inspect.getsourcefile(gmv), inspect.getsourcefile(load_columns), __file__):
+        digest.update(file_digest(path).encode())
+    return digest.hexdigest()
+
+
+# List parameters that may take any (non-empty) length; other lists are
+# fixed-size lever ranges such as (low, mode, high).
+VARIABLE_LENGTH_PARAMS = {('q3', 'years'), ('q3', 'months'), ('tenure', 'exclude'),
+                          ('action_plan', 'targets')}
+MINIMUM_VALUES = {('validate', 'tolerance'): 0, ('simulate', 'seed'): 0,
+                  ('simulate', 'n_simulations'): 1, ('action_plan', 'top_n'): 1}
+
+
+def _check_scalar(name, value, default):
+    """Check one value against the type of its default, returning it coerced."""
+    if isinstance(default, str):
+        if not isinstance(value, str):
+            raise PipelineError(f"{name} must be a string, got {value!r}")
+        return value
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise PipelineError(f"{name} must be a number, got {value!r}")
+    if isinstance(default, int):
+        if not float(value).is_integer():
+            raise PipelineError(f"{name} must be an integer, got {value!r}")
+        return int(value)
+    return float(value)
+
+
+def _check_param(stage, param, value):
+    """Validate an override against the type and shape of its default value."""
+    name = f"{stage}.{param}"
+    default = DEFAULT_PARAMS[stage][param]
+    if not isinstance(default, list):
+        value = _check_scalar(name, value, default)
+        minimum = MINIMUM_VALUES.get((stage, param))
+        if minimum is not None and value < minimum:
+            raise PipelineError(f"{name} must be at least {minimum}, got {value}")
+        return value
+
+    if not isinstance(value, list):
+        raise PipelineError(f"{name} must be a list, got {value!r}")
+    if (stage, param) in VARIABLE_LENGTH_PARAMS:
+        if not value:
+            raise PipelineError(f"{name} must not be empty")
+    elif len(value) != len(default):
+        raise PipelineError(f"{name} must have {len(default)} values, got {len(value)}")
+    value = [_check_scalar(name, item, default[0]) for item in value]
+
+    if (stage, param) not in VARIABLE_LENGTH_PARAMS and not (
+            value == sorted(value) and value[0] < value[-1]):
+        raise PipelineError(f"{name} must be an increasing (low, ..., high) range, got {value}")
+    return value
+
+
+def merge_params(overrides=None):
+    """
+    Combine DEFAULT_PARAMS with per-stage overrides.
+
+    Args:
+        overrides: dict of stage name -> dict of parameter values
+
+    Returns:
+        dict: stage name -> parameters
+
+    Raises:
+        PipelineError: if a stage or parameter name is not in DEFAULT_PARAMS,
+            or a value does not match the type and shape of its default
+    """
+    params = copy.deepcopy(DEFAULT_PARAMS)
+    for stage, values in (overrides or {}).items():
+        if stage not in STAGES:
+            raise PipelineError(f"Unknown stage: {stage}")
+        unknown = sorted(set(values) - set(DEFAULT_PARAMS[stage]))
+        if unknown:
+            raise PipelineError(
+                f"Unknown parameter(s) for {stage}: {', '.join(unknown)} "
+                f"(expected one of: {', '.join(sorted(DEFAULT_PARAMS[stage])) or 'none'})"
+            )
+        for param, value in values.items():
+            params[stage][param] = _check_param(stage, param, value)
+    return params
+
+
+def stage_keys(params):
+    """
+    Compute the cache key of every stage.
+
+    A key hashes the pipeline source (see code_digest), the stage's parameters
+    (file parameters by content rather than path) and the keys of its
+    dependencies, so editing a formula in metrics.py invalidates every stage.
+
+    Args:
+        params: dict of stage name -> parameters (see merge_params)
+
+    Returns:
+        dict: stage name -> hex digest
+    """
+    code = code_digest()
+    keys = {}
+    for name, stage in STAGES.items():
+        stage_params = dict(params[name])
+        for param in stage.file_params:
+            if not os.path.isfile(stage_params[param]):
+                raise PipelineError(f"{name}: file not found: {stage_params[param]}")
+            stage_params[param] = file_digest(stage_params[param])
+
+        payload = json.dumps({
+            'stage': name,
+            'code': code,
+            'params': stage_params,
+            'deps': [keys[dep] for dep in stage.deps],
+        }, sort_keys=True)
+        keys[name] = hashlib.sha256(payload.encode()).hexdigest()
+    return keys
+
+
+def _cache_path(cache_dir, name, key):
+    return os.path.join(cache_dir, f"{name}-{key[:16]}.pkl")
+
+
+def _read_cache(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def _write_cache(cache_dir, name, key, value):
+    """Atomically write a stage output, removing older entries for the same stage."""
+    path = _cache_path(cache_dir, name, key)
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+    for stale in glob.glob(os.path.join(glob.escape(cache_dir), f"{name}-*.pkl")):
+        if stale != path:
+            os.remove(stale)
+
+
+def run_pipeline(targets=DEFAULT_TARGETS, overrides=None, cache_dir=DEFAULT_CACHE_DIR,
+                 use_cache=True, jobs=None, log=print):
+    """
+    Run the stages needed to produce `targets`.
+
+    Stages with a cached result are read from disk and their dependencies
+    are skipped; the rest run in a thread pool as soon as their inputs are
+    available. Only the latest output of each persisted stage is kept in
+    `cache_dir`.
+
+    Args:
+        targets: stage names to produce
+        overrides: dict of stage name -> parameter overrides
+        cache_dir: directory for cached stage outputs
+        use_cache: read cached outputs when True (results are always written)
+        jobs: maximum number of stages scheduled at once (threads share the GIL)
+        log: callable for progress messages
+
+    Returns:
+        dict: target stage name -> output
+    """
+    unknown = [name for name in targets if name not in STAGES]
+    if unknown:
+        raise PipelineError(f"Unknown stage(s): {', '.join(unknown)}")
+    if jobs is not None and jobs < 1:
+        raise PipelineError(f"jobs must be at least 1, got {jobs}")
+
+    params = merge_params(overrides)
+    keys = stage_keys(params)
+    paths = {name: _cache_path(cache_dir, name, keys[name]) for name in STAGES}
+
+    # Walk back from the targets, stopping at stages that are already cached
+    results = {}
+    to_run = set()
+    stack = list(targets)
+    while stack:
+        name = stack.pop()
+        if name in results or name in to_run:
+            continue
+        if use_cache and STAGES[name].persist and os.path.exists(paths[name]):
+            results[name] = _read_cache(paths[name])
+            log(f"  {name:<12} cached")
+        else:
+            to_run.add(name)
+            stack.extend(STAGES[name].deps)
+
+    def execute(name):
+        stage = STAGES[name]
+        start = time.perf_counter()
+        value = stage.func(params[name], *(results[dep] for dep in stage.deps))
+        return value, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        running = {}
+        while to_run or running:
+            for name in STAGES:
+                if name in to_run and all(dep in results for dep in STAGES[name].deps):
+                    to_run.discard(name)
+                    running[executor.submit(execute, name)] = name
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                value, elapsed = future.result()
+                results[name] = value
+                if STAGES[name].persist:
+                    _write_cache(cache_dir, name, keys[name], value)
+                log(f"  {name:<12} ran in {elapsed:.2f}s")
+
+    return {name: results[name] for name in targets}
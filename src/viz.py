@@ -0,0 +1,23 @@
+"""
+Plotting helpers for the FlexWork notebooks.
+"""
+
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+
+def set_style():
+    """
+    Apply the shared chart style used across the notebooks.
+
+    Returns:
+        None
+    """
+    sns.set_theme(style='whitegrid', palette='deep')
+    plt.rcParams.update({
+        'figure.figsize': (12, 6),
+        'figure.dpi': 100,
+        'axes.titlesize': 14,
+        'axes.titleweight': 'bold',
+        'axes.labelsize': 11,
+    })
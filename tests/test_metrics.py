@@ -0,0 +1,143 @@
+"""
+Checks for src/metrics.py and src/db.py: the NumPy core works without pandas,
+and a dict of arrays gives the same results as a DataFrame.
+
+Run from the repository root:
+    python -m unittest discover -s tests
+"""
+
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC)
+
+import metrics  # noqa: E402
+from db import load_columns  # noqa: E402
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+COLUMNS = {
+    'transaction_type': ['Normal', 'Dispute', 'Tip', 'Normal', 'Incentive'],
+    'project_counts_payment': [1, 2, 1, 1, 1],
+    'client_total': [100.0, 200.0, 0.0, 50.0, 0.0],
+    'client_service_fee': [10.0, 20.0, 0.0, 5.0, 0.0],
+    'client_booking_fee': [3.0, 6.0, 0.0, 1.5, 0.0],
+    'vendor_allowances': [0.0, 5.0, 0.0, 0.0, 0.0],
+    'client_credit_memos_excl_compass_sodexo': [0.0, 0.0, 0.0, 2.0, 0.0],
+    'contractor_total': [70.0, 140.0, 20.0, 35.0, 15.0],
+    'contractor_total_tns_coach': [1.4, 2.8, 0.0, 0.7, 0.0],
+    'contractor_w2_taxes': [5.36, 0.0, 0.0, 2.68, 0.0],
+    'total_instant_pay_fees': [1.4, 0.0, 0.0, 0.7, 0.0],
+    'gmv': [113.0, 221.0, 0.0, 54.5, 0.0],
+    'contra_revenue': [73.96, 137.2, 20.0, 36.98, 15.0],
+    'net_revenue': [40.44, np.nan, -20.0, 18.22, -15.0],
+}
+
+PER_SHIFT = (
+    metrics.net_rev_per_shift,
+    metrics.gmv_per_shift,
+    metrics.contra_per_shift,
+    metrics.instant_pay_per_shift,
+)
+
+
+def column_dict():
+    return {name: np.array(values) for name, values in COLUMNS.items()}
+
+
+class CoreImportTest(unittest.TestCase):
+
+    def test_import_does_not_load_pandas(self):
+        code = (
+            "import sys; sys.path.insert(0, {src!r}); import metrics, db; "
+            "sys.exit(1 if 'pandas' in sys.modules else 0)"
+        ).format(src=SRC)
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr or "pandas was imported")
+
+
+class ArrayMetricsTest(unittest.TestCase):
+
+    def test_per_shift_skips_nulls(self):
+        data = column_dict()
+        expected = (40.44 - 20.0 + 18.22 - 15.0) / 6
+        self.assertAlmostEqual(metrics.net_rev_per_shift(data), expected)
+
+    def test_per_shift_is_zero_without_projects(self):
+        data = {'net_revenue': np.array([5.0]), 'project_counts_payment': np.array([0])}
+        self.assertEqual(metrics.net_rev_per_shift(data), 0)
+
+    def test_filter_shift_transactions(self):
+        filtered = metrics.filter_shift_transactions(column_dict())
+        self.assertEqual(filtered['transaction_type'].tolist(), ['Normal', 'Dispute', 'Normal'])
+
+
+@unittest.skipIf(pd is None, "pandas is not installed")
+class DataFrameParityTest(unittest.TestCase):
+
+    def test_calculate_metrics_matches(self):
+        from_dict = metrics.calculate_metrics(column_dict())
+        from_frame = metrics.calculate_metrics(pd.DataFrame(COLUMNS))
+        for column in ('gmv_calc', 'contra_revenue_calc', 'net_revenue_calc'):
+            with self.subTest(column=column):
+                np.testing.assert_allclose(from_dict[column], from_frame[column].to_numpy())
+
+    def test_per_shift_matches(self):
+        data, frame = column_dict(), pd.DataFrame(COLUMNS)
+        for func in PER_SHIFT:
+            with self.subTest(func=func.__name__):
+                self.assertAlmostEqual(func(data), func(frame))
+
+    def test_filter_shift_transactions_matches(self):
+        from_dict = metrics.filter_shift_transactions(column_dict())
+        from_frame = metrics.filter_shift_transactions(pd.DataFrame(COLUMNS))
+        self.assertEqual(from_dict['transaction_type'].tolist(), from_frame['transaction_type'].tolist())
+        self.assertIsInstance(from_frame, pd.DataFrame)
+
+    def test_filter_shift_transactions_handles_pd_na(self):
+        frame = pd.DataFrame({
+            'transaction_type': pd.array(['Normal', pd.NA, 'Tip', 'Dispute'], dtype='string'),
+        })
+        filtered = metrics.filter_shift_transactions(frame)
+        self.assertEqual(filtered['transaction_type'].tolist(), ['Normal', 'Dispute'])
+
+
+class LoadColumnsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'projects.db')
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE projects (zip_code TEXT, net_revenue REAL, shifts INTEGER, empty REAL)")
+        conn.executemany("INSERT INTO projects VALUES (?, ?, ?, ?)", [
+            ('01234', 10.0, 1, None),
+            (None, None, 2, None),
+            ('98765', 20.5, 3, None),
+        ])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_types_and_nulls(self):
+        columns = load_columns(self.db_path)
+        self.assertEqual(columns['zip_code'].tolist(), ['01234', None, '98765'])
+        self.assertEqual(columns['net_revenue'].dtype.kind, 'f')
+        self.assertTrue(np.isnan(columns['net_revenue'][1]))
+        self.assertEqual(columns['shifts'].dtype, np.int64)
+        self.assertTrue(np.isnan(columns['empty']).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,315 @@
+"""
+Checks for src/pipeline.py: root-cause parity with the notebook 03 SQL on a
+small fixture database, and cache invalidation behaviour.
+
+Run from the repository root:
+    python -m unittest discover -s tests
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import pipeline  # noqa: E402
+from pipeline import PipelineError, run_pipeline  # noqa: E402
+
+COLUMNS = [
+    'month_pst', 'business_segment', 'vertical', 'transaction_type',
+    'overbook_project_group_flag', 'new_existing_client', 'zip_code',
+    'project_counts_payment', 'client_total', 'client_service_fee',
+    'client_booking_fee', 'vendor_allowances',
+    'client_credit_memos_excl_compass_sodexo', 'contractor_total',
+    'contractor_total_tns_coach', 'contractor_w2_taxes',
+    'total_instant_pay_fees', 'gmv', 'contra_revenue', 'net_revenue',
+]
+
+# Notebook 03 filter for one Q3 year (section 11 driver queries)
+Q3_WHERE = """
+    strftime('%m', month_pst) IN ('07', '08')
+    AND strftime('%Y', month_pst) = '{year}'
+    AND business_segment IS NOT NULL
+    AND transaction_type IN ('Normal', 'Dispute')
+"""
+
+# Notebook 03 vertical/tenure mix impact query, parameterised by dimension and
+# the dimension's own filters: vertical drops NULLs inside each CTE, tenure
+# drops 'Unknown' (and, through the comparison, NULL) after the join.
+MIX_QUERY = """
+WITH a AS (
+    SELECT {column} AS grp,
+        SUM(project_counts_payment) * 1.0 /
+            (SELECT SUM(project_counts_payment) FROM projects WHERE {where_2024}) AS shift_pct,
+        SUM(net_revenue) / NULLIF(SUM(project_counts_payment), 0) AS nrps
+    FROM projects WHERE {where_2024} {inner_filter} GROUP BY {column}
+),
+b AS (
+    SELECT {column} AS grp,
+        SUM(project_counts_payment) * 1.0 /
+            (SELECT SUM(project_counts_payment) FROM projects WHERE {where_2025}) AS shift_pct,
+        SUM(net_revenue) / NULLIF(SUM(project_counts_payment), 0) AS nrps
+    FROM projects WHERE {where_2025} {inner_filter} GROUP BY {column}
+)
+SELECT
+    COALESCE(a.shift_pct, 0), COALESCE(b.shift_pct, 0), COALESCE(a.nrps, 0)
+FROM a FULL OUTER JOIN b ON a.grp = b.grp
+{outer_filter}
+"""
+
+
+def build_fixture_db(path, seed=7):
+    """Write a small projects table covering NULLs, excluded types and both Q3 periods."""
+    rng = random.Random(seed)
+    months = [f"{year}-{month:02d}-01" for year in (2024, 2025) for month in (1, 7, 8)]
+    rows = []
+    for i in range(3000):
+        month = rng.choice(months)
+        is_2025 = month.startswith('2025')
+        overbooked = rng.random() < (0.25 if is_2025 else 0.15)
+        zero_gmv = overbooked or rng.random() < (0.2 if is_2025 else 0.1)
+
+        client_total = 0.0 if zero_gmv else round(rng.uniform(200, 600), 2)
+        service_fee = round(client_total * 0.1, 2)
+        booking_fee = round(client_total * 0.03, 2)
+        allowances = round(rng.choice([0.0, 5.0]), 2)
+        credits = round(rng.choice([0.0, 0.0, 10.0]), 2)
+        contractor_total = round(rng.uniform(150, 400), 2)
+        tns = round(contractor_total * 0.02, 2)
+        w2 = round(contractor_total * 0.0765 * rng.choice([0, 1]), 2)
+        instant_pay = round(rng.choice([0.0, contractor_total * (0.03 if is_2025 else 0.02)]), 2)
+
+        gmv = round(client_total + service_fee + booking_fee - allowances - credits, 2)
+        contra = round(contractor_total - tns + w2, 2)
+        net = round(gmv + instant_pay - contra, 2)
+
+        rows.append((
+            month,
+            rng.choice(['Consulting', 'Engineering', 'Design', None]),
+            rng.choice(['Professional Services', 'Technical Services', 'Unknown', None]),
+            rng.choices(['Normal', 'Dispute', 'Tip'], weights=[80, 10, 10])[0],
+            int(overbooked),
+            rng.choices(['F90', 'F90+', 'Unknown', None], weights=[10, 80, 5, 5])[0],
+            rng.choice(['01234', '98765', None]),
+            rng.choice([1, 1, 1, 2]),
+            client_total, service_fee, booking_fee, allowances, credits,
+            contractor_total, tns, w2, instant_pay, gmv, contra,
+            None if i % 250 == 0 else net,
+        ))
+
+    conn = sqlite3.connect(path)
+    conn.execute(f"CREATE TABLE projects ({', '.join(COLUMNS)})")
+    conn.executemany(
+        f"INSERT INTO projects VALUES ({', '.join('?' * len(COLUMNS))})", rows
+    )
+    conn.commit()
+    conn.close()
+
+
+def ran_stages(messages):
+    """Stage names that executed (rather than loaded from cache) in a run's log."""
+    return {message.split()[0] for message in messages if ' ran in ' in message}
+
+
+class PipelineTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.db_path = os.path.join(cls.tmp.name, 'flexwork.db')
+        build_fixture_db(cls.db_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def run_stages(self, targets, overrides=None, cache_dir=None):
+        overrides = dict(overrides or {})
+        overrides.setdefault('load', {})['db_path'] = self.db_path
+        messages = []
+        results = run_pipeline(
+            targets=targets,
+            overrides=overrides,
+            cache_dir=cache_dir or os.path.join(self.tmp.name, 'cache'),
+            log=messages.append,
+        )
+        return results, messages
+
+
+class NotebookParityTest(PipelineTestCase):
+    """root_cause should match the notebook 03 SQL for drivers 1-7."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.conn = sqlite3.connect(cls.db_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+        super().tearDownClass()
+
+    def query(self, sql):
+        return self.conn.execute(sql).fetchone()
+
+    def overall(self, year):
+        return self.query(f"""
+            SELECT SUM(net_revenue) / SUM(project_counts_payment),
+                   SUM(contra_revenue) / SUM(project_counts_payment),
+                   SUM(total_instant_pay_fees) / SUM(project_counts_payment)
+            FROM projects WHERE {Q3_WHERE.format(year=year)}
+        """)
+
+    def operations(self, year):
+        # Notebook 03 sections 3-4 and driver 2 (rates left unrounded)
+        where = Q3_WHERE.format(year=year).replace(
+            "IN ('Normal', 'Dispute')", "= 'Normal'"
+        )
+        return self.query(f"""
+            SELECT
+                1.0 * SUM(CASE WHEN gmv = 0 THEN 1 ELSE 0 END) / COUNT(*),
+                1.0 * SUM(CASE WHEN overbook_project_group_flag = 1 THEN 1 ELSE 0 END) / COUNT(*),
+                SUM(CASE WHEN overbook_project_group_flag = 1 THEN net_revenue ELSE 0 END) /
+                    NULLIF(SUM(CASE WHEN overbook_project_group_flag = 1
+                                    THEN project_counts_payment ELSE 0 END), 0),
+                SUM(CASE WHEN overbook_project_group_flag = 0 THEN net_revenue ELSE 0 END) /
+                    NULLIF(SUM(CASE WHEN overbook_project_group_flag = 0
+                                    THEN project_counts_payment ELSE 0 END), 0)
+            FROM projects WHERE {where}
+        """)
+
+    def mix_effect(self, column, inner_filter='', outer_filter=''):
+        rows = self.conn.execute(MIX_QUERY.format(
+            column=column,
+            inner_filter=inner_filter,
+            outer_filter=outer_filter,
+            where_2024=Q3_WHERE.format(year=2024),
+            where_2025=Q3_WHERE.format(year=2025),
+        )).fetchall()
+        return sum((mix_2025 - mix_2024) * nrps_2024 for mix_2024, mix_2025, nrps_2024 in rows)
+
+    def segment_rate_effect(self):
+        rows = self.conn.execute(f"""
+            WITH a AS (
+                SELECT business_segment,
+                    SUM(net_revenue) / NULLIF(SUM(project_counts_payment), 0) AS nrps
+                FROM projects WHERE {Q3_WHERE.format(year=2024)} GROUP BY business_segment
+            ),
+            b AS (
+                SELECT business_segment,
+                    SUM(project_counts_payment) * 1.0 /
+                        (SELECT SUM(project_counts_payment) FROM projects
+                         WHERE {Q3_WHERE.format(year=2025)}) AS shift_pct,
+                    SUM(net_revenue) / NULLIF(SUM(project_counts_payment), 0) AS nrps
+                FROM projects WHERE {Q3_WHERE.format(year=2025)} GROUP BY business_segment
+            )
+            SELECT b.shift_pct, b.nrps - a.nrps
+            FROM a JOIN b ON a.business_segment = b.business_segment
+        """).fetchall()
+        return sum(mix * change for mix, change in rows)
+
+    def test_root_cause_matches_notebook_sql(self):
+        results, _ = self.run_stages(['root_cause'])
+        root_cause = results['root_cause']
+
+        nrps_2024, contra_2024, instant_2024 = self.overall(2024)
+        nrps_2025, contra_2025, instant_2025 = self.overall(2025)
+        zero_2024, overbook_2024, _, _ = self.operations(2024)
+        zero_2025, overbook_2025, overbook_nrps_2025, normal_nrps_2025 = self.operations(2025)
+
+        expected_drivers = {
+            'zero_gmv_rate': (zero_2025 - zero_2024) * -82,
+            'overbook_rate': (overbook_2025 - overbook_2024) * (overbook_nrps_2025 - normal_nrps_2025),
+            'vertical_mix': self.mix_effect('vertical', inner_filter='AND vertical IS NOT NULL'),
+            'tenure_mix': self.mix_effect(
+                'new_existing_client',
+                outer_filter="WHERE COALESCE(a.grp, b.grp) != 'Unknown'",
+            ),
+            'segment_rate': self.segment_rate_effect(),
+            'contra_cost': -(contra_2025 - contra_2024),
+            'instant_pay_fees': instant_2025 - instant_2024,
+        }
+
+        self.assertAlmostEqual(root_cause['baseline_net_rev_per_shift'], nrps_2024, places=9)
+        self.assertAlmostEqual(root_cause['actual_net_rev_per_shift'], nrps_2025, places=9)
+        self.assertEqual(set(root_cause['drivers']), set(expected_drivers))
+        for name, expected in expected_drivers.items():
+            with self.subTest(driver=name):
+                self.assertAlmostEqual(root_cause['drivers'][name], expected, places=9)
+
+
+class CacheTest(PipelineTestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp(dir=self.tmp.name)
+
+    def test_lever_change_reruns_only_simulation(self):
+        _, first = self.run_stages(['validate', 'action_plan'], cache_dir=self.cache_dir)
+        self.assertEqual(ran_stages(first), set(pipeline.STAGES))
+
+        lever = {'simulate': {'pricing_recovery_rate': [0.25, 0.32, 0.40]}}
+        _, second = self.run_stages(['validate', 'action_plan'], lever, cache_dir=self.cache_dir)
+        self.assertEqual(ran_stages(second), {'simulate', 'action_plan'})
+
+        _, third = self.run_stages(['validate', 'action_plan'], lever, cache_dir=self.cache_dir)
+        self.assertEqual(ran_stages(third), set())
+
+    def test_cache_keeps_one_entry_per_persisted_stage(self):
+        self.run_stages(['action_plan'], cache_dir=self.cache_dir)
+        lever = {'simulate': {'pricing_recovery_rate': [0.25, 0.32, 0.40]}}
+        self.run_stages(['action_plan'], lever, cache_dir=self.cache_dir)
+
+        entries = [name.rsplit('-', 1)[0] for name in os.listdir(self.cache_dir)]
+        self.assertNotIn('load', entries)
+        self.assertEqual(sorted(entries), sorted(set(pipeline.STAGES) - {'load', 'validate'}))
+
+    def test_code_change_invalidates_every_stage(self):
+        self.run_stages(['action_plan'], cache_dir=self.cache_dir)
+        with mock.patch.object(pipeline, 'code_digest', return_value='changed'):
+            _, messages = self.run_stages(['action_plan'], cache_dir=self.cache_dir)
+        self.assertEqual(ran_stages(messages), set(pipeline.STAGES) - {'validate'})
+
+
+class ConfigurationTest(PipelineTestCase):
+
+    def test_unknown_parameter_is_rejected(self):
+        with self.assertRaisesRegex(PipelineError, 'n_simulation'):
+            self.run_stages(['simulate'], {'simulate': {'n_simulation': 5}})
+
+    def test_invalid_values_are_rejected(self):
+        cases = [
+            ({'simulate': {'n_simulations': 'abc'}}, 'must be a number'),
+            ({'simulate': {'n_simulations': 0}}, 'at least 1'),
+            ({'simulate': {'n_simulations': 2.5}}, 'must be an integer'),
+            ({'simulate': {'seed': True}}, 'must be a number'),
+            ({'simulate': {'pricing_recovery_rate': [0.2, 0.3]}}, 'must have 3 values'),
+            ({'simulate': {'pricing_recovery_rate': [0.4, 0.3, 0.2]}}, 'increasing'),
+            ({'q3': {'years': 2025}}, 'must be a list'),
+            ({'tenure': {'exclude': [1]}}, 'must be a string'),
+            ({'action_plan': {'top_n': 0}}, 'at least 1'),
+        ]
+        for overrides, message in cases:
+            with self.subTest(overrides=overrides):
+                with self.assertRaisesRegex(PipelineError, message):
+                    pipeline.merge_params(overrides)
+
+    def test_numeric_values_are_coerced_to_default_type(self):
+        params = pipeline.merge_params({'simulate': {'net_recovery_per_shift': [15, 22, 30]}})
+        self.assertEqual(params['simulate']['net_recovery_per_shift'], [15.0, 22.0, 30.0])
+        self.assertTrue(all(isinstance(v, float) for v in params['simulate']['net_recovery_per_shift']))
+
+    def test_jobs_below_one_is_rejected(self):
+        with self.assertRaisesRegex(PipelineError, 'jobs'):
+            run_pipeline(targets=['simulate'], jobs=0, log=lambda message: None)
+
+    def test_single_period_is_rejected(self):
+        with self.assertRaisesRegex(PipelineError, 'baseline and an actual period'):
+            self.run_stages(['root_cause'], {'q3': {'years': [2025]}})
+
+
+if __name__ == '__main__':
+    unittest.main()